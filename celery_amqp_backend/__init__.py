@@ -1,2 +1,7 @@
+from .cache import *
+from .children import *
 from .exceptions import *
+from .inspector import *
+from .local import *
+from .pool import *
 from .backend import *
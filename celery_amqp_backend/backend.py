@@ -1,11 +1,24 @@
 import collections
+import contextlib
 import kombu
+import kombu.exceptions
+import kombu.pools
+import kombu.serialization
+import os
 import socket
+import threading
+import time
+import uuid
 
 from celery import states
 from celery.backends import base
+from celery.utils.functional import LRUCache
 
+from .cache import *
+from .children import *
 from .exceptions import *
+from .local import *
+from .pool import *
 
 
 __all__ = [
@@ -27,6 +40,8 @@ class AMQPBackend(base.BaseBackend):
     Producer = kombu.Producer
     Queue = kombu.Queue
 
+    MESSAGE_ID_NAMESPACE = uuid.UUID("c5d1a4f2-6b0e-4a5e-9d43-2f7c0e8b1a96")
+
     BacklogLimitExceededException = AMQPBacklogLimitExceededException
     WaitEmptyException = AMQPWaitEmptyException
     WaitTimeoutException = AMQPWaitTimeoutException
@@ -35,6 +50,8 @@ class AMQPBackend(base.BaseBackend):
     supports_autoexpire = True
     supports_native_join = True
 
+    local_result_registry = LocalResultRegistry()
+
     retry_policy = {
         "max_retries": 20,
         "interval_start": 0,
@@ -50,6 +67,21 @@ class AMQPBackend(base.BaseBackend):
         persistent=None,
         serializer=None,
         auto_delete=True,
+        prefetch_count=None,
+        deduplicate=None,
+        dedup_window=None,
+        forget_batch_size=None,
+        reconnect=None,
+        local_results=None,
+        local_results_publish=None,
+        broker_url=None,
+        pool_limit=None,
+        channel_max=None,
+        persistent_cache_path=None,
+        persistent_cache_max_entries=None,
+        persistent_cache_ttl=None,
+        children_encoding=None,
+        inspection_headers=None,
         **kwargs,
     ):
         super().__init__(app, **kwargs)
@@ -69,6 +101,86 @@ class AMQPBackend(base.BaseBackend):
         )
         self.serializer = serializer or conf.result_serializer
         self.auto_delete = auto_delete
+        self.prefetch_count = (
+            prefetch_count
+            if prefetch_count is not None
+            else conf.get("result_prefetch_count", None)
+        )
+        self.deduplicate = (
+            deduplicate
+            if deduplicate is not None
+            else conf.get("result_deduplicate", False)
+        )
+        self.dedup_window = (
+            dedup_window
+            if dedup_window is not None
+            else conf.get("result_dedup_window", 1000)
+        )
+        self.forget_batch_size = (
+            forget_batch_size
+            if forget_batch_size is not None
+            else conf.get("result_forget_batch_size", 100)
+        )
+        self.reconnect = (
+            reconnect if reconnect is not None else conf.get("result_reconnect", True)
+        )
+        self.local_results = (
+            local_results
+            if local_results is not None
+            else conf.get("result_local_results", False)
+        )
+        self.local_results_publish = (
+            local_results_publish
+            if local_results_publish is not None
+            else conf.get("result_local_results_publish", True)
+        )
+        self.broker_url = broker_url or conf.get("result_broker_url", None)
+        self.pool_limit = (
+            pool_limit
+            if pool_limit is not None
+            else conf.get("result_pool_limit", None)
+        )
+        self.channel_max = (
+            channel_max
+            if channel_max is not None
+            else conf.get("result_channel_max", None)
+        )
+        self.persistent_cache_path = persistent_cache_path or conf.get(
+            "result_persistent_cache",
+            None,
+        )
+        self.persistent_cache_max_entries = (
+            persistent_cache_max_entries
+            if persistent_cache_max_entries is not None
+            else conf.get("result_persistent_cache_max_entries", 10000)
+        )
+        self.persistent_cache_ttl = (
+            persistent_cache_ttl
+            if persistent_cache_ttl is not None
+            else conf.get("result_persistent_cache_ttl", self.expires)
+        )
+        self.children_encoding = children_encoding or conf.get(
+            "result_children_encoding",
+            "full",
+        )
+        self.inspection_headers = (
+            inspection_headers
+            if inspection_headers is not None
+            else conf.get("result_inspection_headers", True)
+        )
+        self.persistent_cache = (
+            PersistentResultCache(
+                self.persistent_cache_path,
+                max_entries=self.persistent_cache_max_entries,
+                ttl=self.persistent_cache_ttl,
+            )
+            if self.persistent_cache_path
+            else None
+        )
+        self.connection_pool_statistics = PoolStatistics()
+        self.producer_pool_statistics = PoolStatistics()
+        self._connection_pool = self._producer_pool = self._pool_pid = None
+        self._pool_lock = threading.Lock()
 
     def store_result(
         self,
@@ -81,6 +193,7 @@ class AMQPBackend(base.BaseBackend):
     ):
         """
         Sends the task result for the given task identifier to the task result queue and returns the sent result dict.
+        If local results are enabled, ready task results get handed over to waiters within the same process too.
 
         :param task_id: Task identifier to send the result for
         :param result: The task result as dict
@@ -97,18 +210,52 @@ class AMQPBackend(base.BaseBackend):
             request and request.correlation_id or task_id,
         )
 
-        with self.app.amqp.producer_pool.acquire(block=True) as producer:
+        # Redelivered tasks publish the same terminal result again, so we use a deterministic message identifier that
+        # allows the broker and the consumers to drop those duplicates.
+        message_id = self._create_message_id(task_id, state, request)
+
+        # The task name and the time of publishing allow inspecting result queues (see `ResultQueueInspector`).
+        headers = (
+            {
+                "task": getattr(request, "task", None),
+                "timestamp": time.time(),
+            }
+            if self.inspection_headers
+            else {}
+        )
+        if self.deduplicate:
+            headers["x-deduplication-header"] = message_id
+
+        payload = {
+            "task_id": task_id,
+            "status": state,
+            "result": self.encode_result(result, state),
+            "traceback": traceback,
+            "children": self._encode_children(request),
+        }
+
+        # Ready task results are handed over to local waiters. If they are not published to the broker, the local
+        # result registry keeps them until they have been delivered, as there is no other copy.
+        if self.local_results and state in self.READY_STATES:
+            registry = self.local_result_registry
+            if not self.local_results_publish or registry.is_waiting(task_id):
+                registry.put(
+                    task_id,
+                    self._create_local_result(payload),
+                    keep=not self.local_results_publish,
+                )
+
+            if not self.local_results_publish:
+                return result
+
+        with self._acquire_producer() as producer:
             producer.publish(
-                {
-                    "task_id": task_id,
-                    "status": state,
-                    "result": self.encode_result(result, state),
-                    "traceback": traceback,
-                    "children": self.current_task_children(request),
-                },
+                payload,
                 exchange=self.exchange,
                 routing_key=routing_key,
                 correlation_id=correlation_id,
+                message_id=message_id,
+                headers=headers,
                 serializer=self.serializer,
                 retry=True,
                 retry_policy=self.retry_policy,
@@ -144,16 +291,21 @@ class AMQPBackend(base.BaseBackend):
         :param kwargs:
         :return: Task result body as dict
         """
-        for fetched_task_id, fetched_task_result in self.get_many(
-            [
-                task_id,
-            ],
-            timeout=timeout,
-            no_ack=no_ack,
-            cache=cache,
-            on_interval=on_interval,
-        ):
-            return fetched_task_result
+        # We close the iterator explicitly after the first task result, so that its message gets released right
+        # away.
+        with contextlib.closing(
+            self.get_many(
+                [
+                    task_id,
+                ],
+                timeout=timeout,
+                no_ack=no_ack,
+                cache=cache,
+                on_interval=on_interval,
+            ),
+        ) as fetched_task_results:
+            for fetched_task_id, fetched_task_result in fetched_task_results:
+                return fetched_task_result
 
         raise self.WaitEmptyException(task=task_id)
 
@@ -172,6 +324,17 @@ class AMQPBackend(base.BaseBackend):
         queue itself. This method returns an iterator for tuples of task identifier and task results and may raise
         an exception if a result contains an exception message.
 
+        If a prefetch count is configured and `no_ack` is disabled, the consumer applies backpressure: the broker only
+        delivers up to `prefetch_count` unacknowledged messages, and each task result message gets acknowledged after
+        the caller has processed the yielded task result and resumes or closes the iterator. Messages that have been
+        received but not yielded when the iterator gets closed are sent back to the queue.
+
+        If the connection to the broker gets lost while waiting, the connection gets re-established within the
+        remaining timeout, the queue bindings get declared again, and the consumer resumes waiting for the task results
+        that have not been yielded yet. Task results received before the connection loss are kept. Note that the
+        broker deletes `auto_delete` result queues (the default) together with the messages they hold as soon as the
+        connection of their consumer is lost, so task results that were waiting in those queues are lost.
+
         :param task_ids: List of task identifiers we want the result for
         :param timeout: Consumer read timeout
         :param no_ack: If enabled the messages are automatically acknowledged by the broker
@@ -186,10 +349,15 @@ class AMQPBackend(base.BaseBackend):
         mark_cached = cached_task_ids.add
         get_cached = self._cache.get
 
-        # First we try to get the desired task results from the cache and yield the values.
+        # First we try to get the desired task results from the cache and yield the values. Task results that are
+        # not in the in-memory cache may still be in the persistent cache, e.g. after a restart of the process, so we
+        # look those up with a single query.
         if cache:
+            get_persisted = self._get_many_persisted(
+                [task_id for task_id in task_ids if get_cached(task_id) is None],
+            ).get
             for task_id in task_ids:
-                cached_task_result = get_cached(task_id)
+                cached_task_result = get_cached(task_id) or get_persisted(task_id)
                 if (
                     cached_task_result
                     and cached_task_result["status"] in self.READY_STATES
@@ -204,15 +372,99 @@ class AMQPBackend(base.BaseBackend):
         if not task_ids:
             return
 
-        with self.app.pool.acquire_channel(block=True) as (conn, channel):
+        if not self.local_results:
+            yield from self._consume_many(
+                task_ids,
+                timeout=timeout,
+                no_ack=no_ack,
+                on_message=on_message,
+                on_interval=on_interval,
+            )
+            return
+
+        # Task results of tasks that run within this process are handed over locally. We register as a waiter before
+        # looking for them, so that we do not miss task results stored in the meantime.
+        registry = self.local_result_registry
+        registered_task_ids = tuple(task_ids)
+        registry.register(registered_task_ids)
+
+        try:
+            for task_id, local_task_result in registry.get_many(task_ids).items():
+                task_ids.discard(task_id)
+                yield task_id, local_task_result
+
+            # If task results are not published to the broker, there is no need to consume from the broker at all.
+            if self.local_results_publish:
+                yield from self._consume_many(
+                    task_ids,
+                    timeout=timeout,
+                    no_ack=no_ack,
+                    on_message=on_message,
+                    on_interval=on_interval,
+                )
+            else:
+                yield from self._wait_local(
+                    task_ids,
+                    timeout=timeout,
+                    on_interval=on_interval,
+                )
+        finally:
+            registry.unregister(
+                registered_task_ids,
+                delivered=set(registered_task_ids).difference(task_ids),
+            )
+
+    def _consume_many(
+        self,
+        task_ids,
+        timeout=None,
+        no_ack=True,
+        on_message=None,
+        on_interval=None,
+    ):
+        """
+        Consumes the results of multiple tasks from their result queues. Task results handed over locally in the
+        meantime are yielded too.
+
+        :param task_ids: Set of task identifiers we want the result for, from which the yielded ones get removed
+        :param timeout: Consumer read timeout
+        :param no_ack: If enabled the messages are automatically acknowledged by the broker
+        :param on_message: Callback function for received messages
+        :param on_interval: Callback function for message poll intervals
+        :return: Iterator for received task identifier and task result body
+        """
+        with self._acquire_channel() as (conn, channel):
             # We are going to drain messages from the queue. To process the results, we push the task results we get
-            # from the messages to the `results` collection and yield those task results.
+            # from the messages to the `results` collection and yield those task results. If the consumer runs with
+            # a prefetch count and manual acknowledgements, we acknowledge messages ourselves, as the broker would
+            # stop delivering messages otherwise.
+            manual_ack = not no_ack and bool(self.prefetch_count)
+            seen = self._create_seen_set()
             results = collections.deque()
             push_result = results.append
             push_cache = self._cache.__setitem__
+            persisted = []
+            push_persisted = persisted.append
             decode_result = self.meta_from_decoded
             wait = conn.drain_events
             next_task_result = results.popleft
+            get_local = self.local_result_registry.get_many
+
+            def release(message):
+                """
+                Acknowledges the given message if we acknowledge messages ourselves. Task results handed over locally
+                come without a message. Messages received on a channel lost in the meantime cannot be acknowledged
+                anymore, so we skip those.
+
+                :param message: Message drained from the queue, or `None`
+                :return:
+                """
+                if (
+                    manual_ack
+                    and message is not None
+                    and message.channel is consumer.channel
+                ):
+                    message.ack()
 
             def on_message_callback(message):
                 """
@@ -223,6 +475,12 @@ class AMQPBackend(base.BaseBackend):
                 :param message: Message drained from the queue
                 :return:
                 """
+                # Duplicates of messages we already received (e.g. results of redelivered tasks) are dropped without
+                # decoding them.
+                if self._is_duplicate(seen, message):
+                    release(message)
+                    return
+
                 # Decode and process the message a task result.
                 received_task_result = decode_result(message.decode())
 
@@ -236,41 +494,209 @@ class AMQPBackend(base.BaseBackend):
                 )
 
                 # If the task result is ready, we push it to the result cache. If the task result is als a result
-                # for a task we are looking for, we push the result to the `results` collection to yield it afterwards.
+                # for a task we are looking for, we push the result together with its message to the `results`
+                # collection to yield it afterwards. Only those get persisted, in one batch per drain.
                 if received_task_state in self.READY_STATES:
                     push_cache(received_task_id, received_task_result)
 
                     if received_task_id in task_ids:
-                        push_result(received_task_result)
+                        push_persisted((received_task_id, message))
+                        push_result((received_task_result, message))
+                        return
+
+                # Messages we do not yield would block the prefetch window, so we acknowledge them right away.
+                release(message)
 
             # Create the queue bindings for the tasks we want the results for.
             bindings = self._create_many_bindings(task_ids)
 
-            with self.Consumer(
-                channel,
-                bindings,
-                on_message=on_message_callback,
-                accept=self.accept,
-                no_ack=no_ack,
-            ):
-                # Drain task results from the bindings as long as there are tasks left whose result we did
-                # not yield yet.
-                while task_ids:
-                    # Drain messages from the connection.
-                    try:
-                        wait(timeout=timeout)
-                    except socket.timeout:
-                        raise self.WaitTimeoutException()
-
-                    while results:
-                        task_result = next_task_result()
-                        task_id = task_result["task_id"]
-                        task_ids.discard(task_id)
-                        yield task_id, task_result
-
-                    # If there is a callback function for polling intervals, we trigger the callback now.
-                    if on_interval is not None:
-                        on_interval()
+            # With manual acknowledgements, the consumer gets a channel of its own. Otherwise, the prefetch limit would
+            # stay on the shared default channel of the pooled connection, and unacknowledged messages left on that
+            # channel by other fetches would count against it.
+            if manual_ack:
+                channel = conn.channel()
+
+            try:
+                consumer = self.Consumer(
+                    channel,
+                    bindings,
+                    on_message=on_message_callback,
+                    accept=self.accept,
+                    no_ack=no_ack,
+                    prefetch_count=self.prefetch_count or None,
+                )
+
+                with consumer:
+                    # The deadline of the current wait. It survives reconnects, so that a connection loss does not
+                    # extend the time the caller waits for the next task result.
+                    deadline = None
+
+                    # Drain task results from the bindings as long as there are tasks left whose result we did
+                    # not yield yet.
+                    while task_ids:
+                        if timeout is not None and deadline is None:
+                            deadline = time.monotonic() + timeout
+
+                        # Drain messages from the connection.
+                        try:
+                            wait(timeout=self._remaining_timeout(deadline))
+                        except socket.timeout:
+                            raise self.WaitTimeoutException()
+                        except conn.recoverable_connection_errors:
+                            if not self.reconnect:
+                                raise
+
+                            # We keep the task results we already received. If the broker redelivers their
+                            # messages, the redeliveries get dropped as duplicates.
+                            channel = self._reconnect_consumer(
+                                conn,
+                                consumer,
+                                deadline,
+                                own_channel=manual_ack,
+                            )
+                            continue
+                        else:
+                            deadline = None
+
+                        # Task results handed over locally in the meantime are yielded as well. Their messages are
+                        # dropped once they arrive, as we yield only one result per task.
+                        if self.local_results:
+                            for local_task_result in get_local(task_ids).values():
+                                push_result((local_task_result, None))
+
+                        # We persist the task results received within this drain before yielding any of them, as the
+                        # caller may stop iterating at any time.
+                        if persisted:
+                            self._persist_many(persisted)
+                            persisted.clear()
+
+                        while results:
+                            task_result, message = next_task_result()
+                            task_id = task_result["task_id"]
+
+                            # We may have received multiple ready results for the same task within one drain, but we
+                            # yield only the first one.
+                            if task_id not in task_ids:
+                                release(message)
+                                continue
+
+                            task_ids.discard(task_id)
+                            try:
+                                yield task_id, task_result
+                            finally:
+                                # The caller has processed the task result or stopped iterating, so we can release
+                                # the message now.
+                                release(message)
+
+                        # If there is a callback function for polling intervals, we trigger the callback now.
+                        if on_interval is not None:
+                            on_interval()
+            finally:
+                # Task results received right before a reconnect or timeout may not have been persisted yet.
+                self._persist_many(persisted)
+
+                # If the caller stops iterating early, our channel may still hold messages we received but did not
+                # yield. Closing the channel sends them back to the queue.
+                if manual_ack:
+                    conn.maybe_close_channel(channel)
+
+    def _wait_local(self, task_ids, timeout=None, on_interval=None):
+        """
+        Waits for the results of multiple tasks to be handed over locally, without touching the broker. Waiters get
+        woken up by the local result registry as soon as one of their task results is stored.
+
+        :param task_ids: Set of task identifiers we want the result for, from which the yielded ones get removed
+        :param timeout: Read timeout
+        :param on_interval: Callback function for message poll intervals
+        :return: Iterator for received task identifier and task result body
+        """
+        deadline = None
+
+        while task_ids:
+            if timeout is not None and deadline is None:
+                deadline = time.monotonic() + timeout
+
+            local_task_results = self.local_result_registry.wait(
+                task_ids,
+                timeout=self._remaining_timeout(deadline),
+            )
+            if not local_task_results:
+                raise self.WaitTimeoutException()
+            deadline = None
+
+            for task_id, local_task_result in local_task_results.items():
+                task_ids.discard(task_id)
+                yield task_id, local_task_result
+
+            # If there is a callback function for polling intervals, we trigger the callback now.
+            if on_interval is not None:
+                on_interval()
+
+    def iter_many(
+        self,
+        task_ids,
+        chunk_size=None,
+        propagate=True,
+        timeout=None,
+        no_ack=True,
+        cache=True,
+        **kwargs,
+    ):
+        """
+        Gets the results of multiple tasks in the order they arrive, without collecting them first. This method
+        returns an iterator for the task result values, or for lists of up to `chunk_size` task result values if a
+        chunk size is given. Each task result is released as soon as the caller resumes the iterator.
+
+        :param task_ids: List of task identifiers we want the result for
+        :param chunk_size: Number of task result values per yielded list, or `None` to yield single values
+        :param propagate: Raise the exception of a failed task
+        :param timeout: Consumer read timeout
+        :param no_ack: If enabled the messages are automatically acknowledged by the broker
+        :param cache: Make use of the result backend cache
+        :param kwargs: Further arguments for `get_many`
+        :return: Iterator for task result values or lists of task result values
+        """
+        chunk = []
+
+        for _, task_result in self.get_many(
+            task_ids,
+            timeout=timeout,
+            no_ack=no_ack,
+            cache=cache,
+            **kwargs,
+        ):
+            if propagate and task_result["status"] in self.PROPAGATE_STATES:
+                raise task_result["result"]
+
+            if chunk_size is None:
+                yield task_result["result"]
+                continue
+
+            chunk.append(task_result["result"])
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def reduce_many(self, task_ids, fn, initial=None, chunk_size=None, **kwargs):
+        """
+        Folds the results of multiple tasks in the order they arrive, without collecting them first. The function
+        gets called with the accumulated value and the next task result value, or the next list of up to
+        `chunk_size` task result values if a chunk size is given.
+
+        :param task_ids: List of task identifiers we want the result for
+        :param fn: Function taking the accumulated value and a task result value, returning the new accumulated value
+        :param initial: Initial accumulated value
+        :param chunk_size: Number of task result values passed to the function at once, or `None` to pass single values
+        :param kwargs: Further arguments for `iter_many`
+        :return: Accumulated value
+        """
+        accumulated = initial
+        for value in self.iter_many(task_ids, chunk_size=chunk_size, **kwargs):
+            accumulated = fn(accumulated, value)
+        return accumulated
 
     def get_task_meta(self, task_id, backlog_limit=1000):
         """
@@ -282,7 +708,18 @@ class AMQPBackend(base.BaseBackend):
         :param backlog_limit: Limits how often we fetch a message from the result queue to get the latest one
         :return: Result meta as dict
         """
-        with self.app.pool.acquire_channel(block=True) as (_, channel):
+        # Ready task results of tasks that ran within this process are final, so there is no need to look at the queue.
+        if self.local_results:
+            local_task_result = self.local_result_registry.get(task_id)
+            if local_task_result:
+                return local_task_result
+
+        # The same applies to ready task results we already received before, even in a previous process.
+        persisted_task_result = self._get_persisted(task_id)
+        if persisted_task_result:
+            return persisted_task_result
+
+        with self._acquire_channel() as (_, channel):
             # First we bind to the queue and declare the queue to make sure it exists and that we can read
             # from it later on.
             binding = self._create_binding(task_id)(channel)
@@ -304,6 +741,13 @@ class AMQPBackend(base.BaseBackend):
                 if not current:
                     break
 
+                # A duplicate of the latest message carries no new information, so we remove it from the queue right
+                # away. Duplicates of older messages are not dropped, as they are more recent than the messages in
+                # between (e.g. the result of a redelivered task after its state updates).
+                if latest and self._is_same_message(latest, current):
+                    current.ack()
+                    continue
+
                 # We make sure that the task result message we got is for the task we are interested in. As we declare
                 # a separate result queue for each task, there should not be any messages for other tasks, but better
                 # be safe than sorry.
@@ -323,6 +767,8 @@ class AMQPBackend(base.BaseBackend):
             # cache, and assume that the task result is pending if it is not present on the cache.
             if latest:
                 payload = self._cache[task_id] = self.meta_from_decoded(latest.payload)
+                if payload["status"] in self.READY_STATES:
+                    self._persist(task_id, latest)
                 latest.requeue()
                 return payload
             else:
@@ -334,6 +780,88 @@ class AMQPBackend(base.BaseBackend):
                         "result": None,
                     }
 
+    def forget_many(self, task_ids, batch_size=None):
+        """
+        Forgets the results of multiple tasks by deleting their result queues. The queues get deleted over a single
+        channel in batches, where we only wait for the broker to confirm the last deletion of each batch.
+
+        :param task_ids: List of task identifiers we want to forget the results for
+        :param batch_size: Number of queue deletions sent before waiting for the broker, defaults to the configured
+            batch size
+        :return:
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+
+        batch_size = batch_size or self.forget_batch_size or len(task_ids)
+        pop_cached = self._cache.pop
+        discard_local = self.local_result_registry.discard
+
+        with self._acquire_channel() as (_, channel):
+            for offset in range(0, len(task_ids), batch_size):
+                batch = task_ids[offset : offset + batch_size]
+
+                # As the broker processes the methods of a channel in order, the confirmation of the last deletion
+                # within a batch implies that all previous deletions of the batch have been processed as well.
+                for i, task_id in enumerate(batch, 1):
+                    pop_cached(task_id, None)
+                    discard_local(task_id)
+                    self._create_binding(task_id)(channel).delete(
+                        nowait=i < len(batch),
+                    )
+
+                # The persistent cache entries of a batch are removed within a single transaction.
+                if self.persistent_cache is not None:
+                    self.persistent_cache.discard_many(batch)
+
+    @property
+    def dedicated_pools(self):
+        """
+        Whether the result backend uses connection and producer pools of its own instead of sharing the pools of the
+        task broker.
+        """
+        return any(
+            option is not None
+            for option in (self.broker_url, self.pool_limit, self.channel_max)
+        )
+
+    @property
+    def connection_pool(self):
+        """
+        Connection pool used to consume task results.
+        """
+        if not self.dedicated_pools:
+            return self.app.pool
+
+        self._ensure_pools()
+        return self._connection_pool
+
+    @property
+    def producer_pool(self):
+        """
+        Producer pool used to publish task results.
+        """
+        if not self.dedicated_pools:
+            return self.app.amqp.producer_pool
+
+        self._ensure_pools()
+        return self._producer_pool
+
+    def meta_from_decoded(self, meta):
+        """
+        Processes a decoded task result. Compact children references get wrapped, so that they are expanded only when
+        accessed.
+
+        :param meta: Decoded task result as dict
+        :return: Processed task result as dict
+        """
+        children = meta.get("children")
+        if isinstance(children, dict) and "compact" in children:
+            meta["children"] = CompactChildren(children["compact"])
+
+        return super().meta_from_decoded(meta)
+
     def as_uri(self, include_password=True):
         """
         Gets the URL representation of the result backend.
@@ -369,7 +897,214 @@ class AMQPBackend(base.BaseBackend):
         raise NotImplementedError("add_to_chord is not supported by this backend.")
 
     def _forget(self, task_id):
-        pass
+        self.forget_many([task_id])
+
+    def _ensure_pools(self):
+        """
+        Creates the dedicated connection and producer pools of the result backend. Pools inherited from a parent
+        process are dropped, as their connections must not be shared with the child process. Threads sharing the
+        result backend create the pools only once.
+
+        :return:
+        """
+        if self._connection_pool is not None and self._pool_pid == os.getpid():
+            return
+
+        with self._pool_lock:
+            # Another thread may have created the pools while we were waiting for the lock.
+            if self._connection_pool is not None and self._pool_pid == os.getpid():
+                return
+
+            transport_options = dict(self.app.conf.broker_transport_options or {})
+            if self.channel_max is not None:
+                transport_options["channel_max"] = self.channel_max
+
+            connection = self.app.connection_for_write(
+                self.broker_url,
+                transport_options=transport_options,
+            )
+            limit = (
+                self.pool_limit if self.pool_limit is not None else self.app.pool.limit
+            )
+
+            self._connection_pool = connection.Pool(limit=limit)
+            self._producer_pool = kombu.pools.ProducerPool(
+                self._connection_pool,
+                limit=limit,
+                Producer=self.Producer,
+            )
+            self._pool_pid = os.getpid()
+
+    @contextlib.contextmanager
+    def _acquire_channel(self):
+        """
+        Acquires a connection from the connection pool and records the time spent waiting for it.
+
+        :return: Context manager yielding the connection and its default channel
+        """
+        with self.connection_pool_statistics.measure(
+            lambda: self.connection_pool.acquire(block=True),
+        ) as conn:
+            yield conn, conn.default_channel
+
+    def _acquire_producer(self):
+        """
+        Acquires a producer from the producer pool and records the time spent waiting for it.
+
+        :return: Context manager yielding the producer
+        """
+        return self.producer_pool_statistics.measure(
+            lambda: self.producer_pool.acquire(block=True),
+        )
+
+    def _create_local_result(self, payload):
+        """
+        Creates the task result handed over to local waiters. The payload is serialized and deserialized again with
+        the configured serializer, so that local waiters get the same task result as remote ones, and do not share
+        mutable state with the task.
+
+        :param payload: Task result payload as dict
+        :return: Decoded task result as dict
+        """
+        content_type, content_encoding, body = kombu.serialization.dumps(
+            payload,
+            serializer=self.serializer,
+        )
+        return self.meta_from_decoded(
+            kombu.serialization.loads(
+                body,
+                content_type,
+                content_encoding,
+                accept=self.accept,
+            ),
+        )
+
+    def _encode_children(self, request):
+        """
+        Encodes the children of the current task for the task result message, according to the configured children
+        encoding. If the children cannot be encoded in the compact encoding, the full encoding is used.
+
+        :param request: Request data
+        :return: Encoded children
+        """
+        if self.children_encoding == "none":
+            return None
+
+        children = self.current_task_children(request)
+        if self.children_encoding == "compact" and children:
+            compact = compact_children(children)
+            if compact is not None:
+                return {"compact": compact}
+
+        return children
+
+    def _get_persisted(self, task_id):
+        """
+        Gets the task result for the given task identifier from the persistent cache.
+
+        :param task_id: Task identifier as string
+        :return: Task result as dict, or `None` if there is no persistent cache or no cached task result
+        """
+        return self._get_many_persisted([task_id]).get(task_id)
+
+    def _get_many_persisted(self, task_ids):
+        """
+        Gets the task results for the given task identifiers from the persistent cache with a single lookup.
+
+        :param task_ids: List of task identifiers
+        :return: Dict of task identifiers and task results as dicts, empty if there is no persistent cache
+        """
+        if self.persistent_cache is None or not task_ids:
+            return {}
+
+        return {
+            task_id: self.meta_from_decoded(
+                kombu.serialization.loads(
+                    body,
+                    content_type,
+                    content_encoding,
+                    accept=self.accept,
+                ),
+            )
+            for task_id, (
+                body,
+                content_type,
+                content_encoding,
+            ) in self.persistent_cache.get_many(task_ids).items()
+        }
+
+    def _persist(self, task_id, message):
+        """
+        Stores the raw task result message for the given task identifier to the persistent cache, if there is one.
+
+        :param task_id: Task identifier as string
+        :param message: Task result message
+        :return:
+        """
+        self._persist_many([(task_id, message)])
+
+    def _persist_many(self, messages):
+        """
+        Stores the raw task result messages for the given task identifiers to the persistent cache within a single
+        transaction, if there is one.
+
+        :param messages: List of tuples of task identifier and task result message
+        :return:
+        """
+        if self.persistent_cache is not None and messages:
+            self.persistent_cache.put_many(
+                (task_id, message.body, message.content_type, message.content_encoding)
+                for task_id, message in messages
+            )
+
+    def _reconnect_consumer(self, conn, consumer, deadline=None, own_channel=False):
+        """
+        Re-establishes a lost connection and revives the given consumer on a fresh channel. Reviving the consumer
+        declares the queue bindings again, and the consumer resumes consuming from them.
+
+        :param conn: The connection that got lost
+        :param consumer: The consumer to revive
+        :param deadline: Monotonic time until the connection must be re-established, or `None` to wait without limit
+        :param own_channel: Revive the consumer on a channel of its own instead of the default channel
+        :return: The channel the consumer got revived on
+        """
+        timeout = self._remaining_timeout(deadline)
+
+        conn.collect()
+        try:
+            conn.ensure_connection(
+                max_retries=self.retry_policy["max_retries"],
+                interval_start=self.retry_policy["interval_start"],
+                interval_step=self.retry_policy["interval_step"],
+                interval_max=self.retry_policy["interval_max"],
+                timeout=timeout,
+            )
+        except kombu.exceptions.OperationalError as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise self.WaitTimeoutException(internal_exception=e) from e
+            raise
+
+        channel = conn.channel() if own_channel else conn.default_channel
+        consumer.revive(channel)
+        consumer.consume()
+
+        return channel
+
+    def _remaining_timeout(self, deadline):
+        """
+        Gets the time left until the given deadline.
+
+        :param deadline: Monotonic time as float, or `None` if there is no deadline
+        :return: Remaining time in seconds, or `None` if there is no deadline
+        """
+        if deadline is None:
+            return None
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self.WaitTimeoutException()
+
+        return remaining
 
     def _create_exchange(self, name, exchange_type="direct", delivery_mode=2):
         """
@@ -403,6 +1138,9 @@ class AMQPBackend(base.BaseBackend):
             durable=self.persistent,
             auto_delete=self.auto_delete,
             expires=self.expires,
+            queue_arguments=(
+                {"x-message-deduplication": True} if self.deduplicate else None
+            ),
         )
 
     def _create_many_bindings(self, task_ids):
@@ -424,6 +1162,63 @@ class AMQPBackend(base.BaseBackend):
         """
         return f"{self.result_exchange}.{task_id}"
 
+    def _create_message_id(self, task_id, state, request=None):
+        """
+        Creates a message identifier for a task result message. Ready task results get a deterministic identifier
+        derived from the task identifier, the state and the attempt, so that the same result of a redelivered task
+        gets the same identifier. All other task results get a random identifier, as a task may legitimately send the
+        same state multiple times (e.g. progress updates).
+
+        :param task_id: Task identifier as string
+        :param state: The task result state
+        :param request: Request data
+        :return: Message identifier as string
+        """
+        if state not in self.READY_STATES:
+            return str(uuid.uuid4())
+
+        attempt = getattr(request, "retries", None) or 0
+        return str(
+            uuid.uuid5(self.MESSAGE_ID_NAMESPACE, f"{task_id}:{state}:{attempt}")
+        )
+
+    def _create_seen_set(self):
+        """
+        Creates a bounded collection of message identifiers used to detect duplicate task result messages.
+
+        :return: Created collection, or `None` if client-side deduplication is disabled
+        """
+        return LRUCache(limit=self.dedup_window) if self.dedup_window else None
+
+    def _is_same_message(self, message, other):
+        """
+        Checks whether the given messages have the same message identifier.
+
+        :param message: Message drained from the queue
+        :param other: Other message drained from the queue
+        :return: `True` if both messages have the same identifier, `False` otherwise
+        """
+        message_id = message.properties.get("message_id")
+        return message_id is not None and message_id == other.properties.get(
+            "message_id",
+        )
+
+    def _is_duplicate(self, seen, message):
+        """
+        Checks whether the given message has been seen before, and marks it as seen otherwise.
+
+        :param seen: Collection of seen message identifiers as created by `_create_seen_set`
+        :param message: Message drained from the queue
+        :return: `True` if the message is a duplicate, `False` otherwise
+        """
+        message_id = message.properties.get("message_id")
+        if seen is None or message_id is None:
+            return False
+        if message_id in seen:
+            return True
+        seen[message_id] = True
+        return False
+
     def __reduce__(self, args=(), kwargs=None):
         kwargs = kwargs if kwargs else {}
         kwargs.update(
@@ -434,5 +1229,20 @@ class AMQPBackend(base.BaseBackend):
             serializer=self.serializer,
             auto_delete=self.auto_delete,
             expires=self.expires,
+            prefetch_count=self.prefetch_count,
+            deduplicate=self.deduplicate,
+            dedup_window=self.dedup_window,
+            forget_batch_size=self.forget_batch_size,
+            reconnect=self.reconnect,
+            local_results=self.local_results,
+            local_results_publish=self.local_results_publish,
+            broker_url=self.broker_url,
+            pool_limit=self.pool_limit,
+            channel_max=self.channel_max,
+            persistent_cache_path=self.persistent_cache_path,
+            persistent_cache_max_entries=self.persistent_cache_max_entries,
+            persistent_cache_ttl=self.persistent_cache_ttl,
+            children_encoding=self.children_encoding,
+            inspection_headers=self.inspection_headers,
         )
         return super().__reduce__(args, kwargs)
@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import threading
+import time
+
+__all__ = [
+    "PersistentResultCache",
+]
+
+
+class PersistentResultCache:
+    """
+    SQLite backed cache for raw task result messages that survives process restarts. Entries expire after `ttl`
+    seconds, and the least recently used entries get evicted once the cache holds more than `max_entries` entries.
+    The cache file may be shared by multiple processes.
+
+    To keep the cache cheap on the hot path, writes are meant to be batched with `put_many`, reads only record the
+    access time in memory (it gets written along with the next batch of writes), and evictions only run once the
+    number of writes since the last eviction exceeds `eviction_margin` times `max_entries`. Thus, the cache may
+    temporarily hold more entries than `max_entries`.
+    """
+
+    mmap_size = 64 * 1024 * 1024
+    eviction_margin = 0.1
+    max_variables = 500
+
+    def __init__(self, path, max_entries=10000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._connection = self._pid = None
+        self._accessed = {}
+        self._writes = 0
+
+    def get(self, task_id):
+        """
+        Gets the cached task result message for the given task identifier.
+
+        :param task_id: Task identifier as string
+        :return: Tuple of message body, content type and content encoding, or `None` if there is no cached message
+        """
+        return self.get_many([task_id]).get(task_id)
+
+    def get_many(self, task_ids):
+        """
+        Gets the cached task result messages for the given task identifiers.
+
+        :param task_ids: List of task identifiers
+        :return: Dict of task identifiers and tuples of message body, content type and content encoding
+        """
+        task_ids = list(task_ids)
+        now = time.time()
+        found = {}
+
+        with self._lock:
+            connection = self._connect()
+
+            for offset in range(0, len(task_ids), self.max_variables):
+                batch = task_ids[offset : offset + self.max_variables]
+                rows = connection.execute(
+                    "SELECT task_id, body, content_type, content_encoding FROM results "
+                    f"WHERE task_id IN ({', '.join('?' * len(batch))}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (*batch, now),
+                )
+                for task_id, body, content_type, content_encoding in rows:
+                    found[task_id] = (body, content_type, content_encoding)
+
+            for task_id in found:
+                self._accessed[task_id] = now
+
+        return found
+
+    def put(self, task_id, body, content_type, content_encoding):
+        """
+        Stores the task result message for the given task identifier.
+
+        :param task_id: Task identifier as string
+        :param body: Raw message body
+        :param content_type: Content type of the message body as string
+        :param content_encoding: Content encoding of the message body as string
+        :return:
+        """
+        self.put_many([(task_id, body, content_type, content_encoding)])
+
+    def put_many(self, entries):
+        """
+        Stores multiple task result messages within a single transaction, and evicts expired and least recently used
+        entries if enough entries have been written since the last eviction.
+
+        :param entries: List of tuples of task identifier, message body, content type and content encoding
+        :return:
+        """
+        entries = list(entries)
+        if not entries:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results "
+                    "(task_id, body, content_type, content_encoding, accessed_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [entry + (now, expires_at) for entry in entries],
+                )
+                self._flush_accessed(connection)
+
+                self._writes += len(entries)
+                if self._writes > self.max_entries * self.eviction_margin:
+                    self._evict(connection, now)
+                    self._writes = 0
+
+    def discard(self, task_id):
+        """
+        Removes the cached task result message for the given task identifier, if present.
+
+        :param task_id: Task identifier as string
+        :return:
+        """
+        self.discard_many([task_id])
+
+    def discard_many(self, task_ids):
+        """
+        Removes the cached task result messages for the given task identifiers within a single transaction.
+
+        :param task_ids: List of task identifiers
+        :return:
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "DELETE FROM results WHERE task_id = ?",
+                    [(task_id,) for task_id in task_ids],
+                )
+            for task_id in task_ids:
+                self._accessed.pop(task_id, None)
+
+    def clear(self):
+        """
+        Removes all cached task result messages.
+
+        :return:
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM results")
+            self._accessed.clear()
+
+    def _flush_accessed(self, connection):
+        """
+        Writes the access times recorded by reads since the last flush.
+
+        :param connection: Database connection
+        :return:
+        """
+        if self._accessed:
+            connection.executemany(
+                "UPDATE results SET accessed_at = ? WHERE task_id = ?",
+                [
+                    (accessed_at, task_id)
+                    for task_id, accessed_at in self._accessed.items()
+                ],
+            )
+            self._accessed.clear()
+
+    def _evict(self, connection, now):
+        """
+        Deletes expired entries as well as the least recently used entries exceeding `max_entries`.
+
+        :param connection: Database connection
+        :param now: Current time as timestamp
+        :return:
+        """
+        connection.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        if self.max_entries:
+            connection.execute(
+                "DELETE FROM results WHERE task_id IN ("
+                "SELECT task_id FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+
+    def _connect(self):
+        """
+        Gets the database connection of the current process, and creates the database schema if necessary. A
+        connection inherited from a parent process is not reused.
+
+        :return: Database connection
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "task_id TEXT PRIMARY KEY, "
+            "body BLOB, "
+            "content_type TEXT, "
+            "content_encoding TEXT, "
+            "accessed_at REAL NOT NULL, "
+            "expires_at REAL"
+            ")",
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)",
+        )
+        connection.commit()
+
+        self._connection, self._pid, self._accessed = connection, os.getpid(), {}
+        return connection
@@ -0,0 +1,71 @@
+import collections.abc
+
+__all__ = [
+    "CompactChildren",
+    "compact_children",
+]
+
+
+class CompactChildren(collections.abc.Sequence):
+    """
+    Read-only sequence of task children references in the compact encoding. The references get expanded to the tuple
+    representation Celery uses (see `celery.result.result_from_tuple`) only when accessed.
+
+    In the compact encoding, a task result is represented by its identifier, and a group result by a list of its
+    identifier and the compact representation of its results.
+    """
+
+    def __init__(self, compact):
+        self._compact = compact
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._expand(child) for child in self._compact[index]]
+        return self._expand(self._compact[index])
+
+    def __len__(self):
+        return len(self._compact)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._compact!r})"
+
+    @classmethod
+    def _expand(cls, child):
+        """
+        Expands a compact child reference to its tuple representation.
+
+        :param child: Compact child reference
+        :return: Tuple representation of the child
+        """
+        if isinstance(child, str):
+            return (child, None), None
+
+        group_id, results = child
+        return (group_id, None), [cls._expand(result) for result in results]
+
+
+def compact_children(children):
+    """
+    Encodes a list of task children references in the tuple representation in the compact encoding. As the compact
+    encoding does not hold parent references, children with a parent cannot be encoded.
+
+    :param children: List of task children in the tuple representation
+    :return: List of compact child references, or `None` if the children cannot be encoded
+    """
+    compact = []
+
+    for child in children:
+        (child_id, parent), results = child
+        if parent:
+            return None
+
+        if results is None:
+            compact.append(child_id)
+            continue
+
+        compact_results = compact_children(results)
+        if compact_results is None:
+            return None
+        compact.append([child_id, compact_results])
+
+    return compact
@@ -0,0 +1,111 @@
+import click
+import json
+
+from celery.bin.base import CeleryCommand, CeleryOption, handle_preload_options
+
+from .inspector import *
+
+__all__ = [
+    "amqp_results",
+]
+
+
+@click.group(name="amqp_results")
+def amqp_results():
+    """Tools for the result queues of the AMQP result backend."""
+
+
+@amqp_results.command(cls=CeleryCommand)
+@click.argument("task_ids", nargs=-1, required=True)
+@click.option(
+    "--sample-size",
+    cls=CeleryOption,
+    type=int,
+    default=100,
+    help_group="Inspect Options",
+    help="Maximum number of messages sampled per result queue.",
+)
+@click.option(
+    "--max-message-size",
+    cls=CeleryOption,
+    type=int,
+    default=1024 * 1024,
+    help_group="Inspect Options",
+    help="Message size in bytes above which a result queue is flagged as oversized.",
+)
+@click.option(
+    "--orphan-age",
+    cls=CeleryOption,
+    type=float,
+    default=None,
+    help_group="Inspect Options",
+    help="Message age in seconds above which an unconsumed result queue is flagged as orphaned. "
+    "Defaults to result_expires.",
+)
+@click.option(
+    "--backlog-limit",
+    cls=CeleryOption,
+    type=int,
+    default=1000,
+    help_group="Inspect Options",
+    help="Queue depth from which on a result queue is flagged for exceeding the backlog limit.",
+)
+@click.option(
+    "--depth-only",
+    cls=CeleryOption,
+    is_flag=True,
+    help_group="Inspect Options",
+    help="Only report the depth and consumers of the result queues without fetching any messages, which would renew "
+    "the expiry of the result queues and mark their messages as redelivered.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    cls=CeleryOption,
+    is_flag=True,
+    help_group="Inspect Options",
+    help="Print the report as JSON.",
+)
+@click.pass_context
+@handle_preload_options
+def inspect(
+    ctx,
+    task_ids,
+    sample_size,
+    max_message_size,
+    orphan_age,
+    backlog_limit,
+    depth_only,
+    as_json,
+    **kwargs,
+):
+    """Inspect the result queues of the given tasks."""
+    report = ResultQueueInspector(
+        ctx.obj.app.backend,
+        sample_size=sample_size,
+        max_message_size=max_message_size,
+        orphan_age=orphan_age,
+        backlog_limit=backlog_limit,
+        depth_only=depth_only,
+    ).inspect(task_ids)
+
+    if as_json:
+        ctx.obj.echo(json.dumps(report, indent=2))
+        return
+
+    for queue in report["queues"]:
+        if not queue["exists"]:
+            ctx.obj.echo(f"{queue['queue']}: missing")
+            continue
+
+        flags = [
+            flag
+            for flag in ("orphaned", "oversized", "backlog_exceeded")
+            if queue[flag]
+        ]
+        ctx.obj.echo(
+            f"{queue['queue']}: task={queue['task_name']} depth={queue['depth']} "
+            f"consumers={queue['consumers']} max_message_size={queue['max_message_size']} "
+            f"oldest_age={queue['oldest_age']} update_rate={queue['update_rate']:.2f}/s "
+            f"states={queue['states']}" + (f" [{', '.join(flags)}]" if flags else ""),
+        )
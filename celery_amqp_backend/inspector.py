@@ -0,0 +1,226 @@
+import collections
+import time
+
+__all__ = [
+    "ResultQueueInspector",
+]
+
+
+class ResultQueueInspector:
+    """
+    Inspects the result queues of an `AMQPBackend`. The result queues get sampled through a channel of the backend's
+    own connection pool: the queue depth is taken from a passive queue declaration, and up to `sample_size` messages
+    get fetched and sent back to the queue afterwards to determine their size, age and state. As AMQP does not allow
+    listing queues, the task identifiers of the queues to inspect must be given.
+
+    Fetching messages is not free of side effects: it counts as queue usage and thus renews the `x-expires` lease of
+    the result queue, and the messages sent back to the queue are delivered with the redelivered flag set afterwards.
+    With `depth_only`, only the passive queue declaration is done, which reports the depth and the consumers without
+    touching the messages.
+    """
+
+    def __init__(
+        self,
+        backend,
+        sample_size=100,
+        max_message_size=1024 * 1024,
+        orphan_age=None,
+        backlog_limit=1000,
+        depth_only=False,
+    ):
+        self.backend = backend
+        self.sample_size = sample_size
+        self.max_message_size = max_message_size
+        self.orphan_age = orphan_age if orphan_age is not None else backend.expires
+        self.backlog_limit = backlog_limit
+        self.depth_only = depth_only
+
+    def inspect(self, task_ids):
+        """
+        Inspects the result queues of the given tasks and aggregates the results per task name.
+
+        :param task_ids: List of task identifiers whose result queues we want to inspect
+        :return: Report as dict, holding the reports of the queues as well as the aggregated reports per task name
+        """
+        queues = self.inspect_queues(task_ids)
+
+        return {
+            "queues": queues,
+            "tasks": self.aggregate(queues),
+        }
+
+    def inspect_queues(self, task_ids):
+        """
+        Inspects the result queues of the given tasks.
+
+        :param task_ids: List of task identifiers whose result queues we want to inspect
+        :return: List of queue reports as dicts
+        """
+        with self.backend._acquire_channel() as (conn, _):
+            # A passive declaration of a missing queue closes the channel, so we use channels of our own and replace
+            # them whenever the broker closed one.
+            channel = conn.channel()
+            reports = []
+
+            try:
+                for task_id in task_ids:
+                    try:
+                        reports.append(self._inspect_queue(channel, task_id))
+                    except conn.channel_errors:
+                        reports.append(self._create_report(task_id, exists=False))
+                        conn.maybe_close_channel(channel)
+                        channel = conn.channel()
+            finally:
+                conn.maybe_close_channel(channel)
+
+        return reports
+
+    def aggregate(self, reports):
+        """
+        Aggregates the given queue reports per task name. Messages without a task name (e.g. published by older
+        versions of the backend) are aggregated under `None`.
+
+        :param reports: List of queue reports as dicts
+        :return: Dict of task names and their aggregated reports as dicts
+        """
+        tasks = collections.defaultdict(
+            lambda: {
+                "queues": 0,
+                "depth": 0,
+                "max_depth": 0,
+                "sampled": 0,
+                "total_size": 0,
+                "max_message_size": 0,
+                "update_rate": 0.0,
+                "orphaned": [],
+                "oversized": [],
+                "backlog_exceeded": [],
+            },
+        )
+
+        for report in reports:
+            if not report["exists"]:
+                continue
+
+            task = tasks[report["task_name"]]
+            task["queues"] += 1
+            task["depth"] += report["depth"]
+            task["max_depth"] = max(task["max_depth"], report["depth"])
+            task["sampled"] += report["sampled"]
+            task["total_size"] += report["total_size"]
+            task["max_message_size"] = max(
+                task["max_message_size"],
+                report["max_message_size"],
+            )
+            task["update_rate"] += report["update_rate"]
+
+            for flag in ("orphaned", "oversized", "backlog_exceeded"):
+                if report[flag]:
+                    task[flag].append(report["task_id"])
+
+        return dict(tasks)
+
+    def _inspect_queue(self, channel, task_id):
+        """
+        Inspects the result queue of the given task.
+
+        :param channel: Channel to use
+        :param task_id: Task identifier as string
+        :return: Queue report as dict
+        """
+        binding = self.backend._create_binding(task_id)(channel)
+        _, depth, consumers = binding.queue_declare(passive=True)
+
+        if self.depth_only:
+            return self._create_report(
+                task_id,
+                exists=True,
+                depth=depth,
+                consumers=consumers,
+                backlog_exceeded=depth >= self.backlog_limit,
+            )
+
+        now = time.time()
+        messages = []
+
+        # We fetch messages without acknowledging them, so that they stay unacknowledged until we send all of them
+        # back to the queue.
+        try:
+            for _ in range(min(depth, self.sample_size)):
+                message = binding.get(accept=self.backend.accept, no_ack=False)
+                if not message:
+                    break
+                messages.append(message)
+
+            sizes = [len(message.body or b"") for message in messages]
+            timestamps = [
+                message.headers["timestamp"]
+                for message in messages
+                if message.headers and message.headers.get("timestamp") is not None
+            ]
+            task_names = [
+                message.headers.get("task") for message in messages if message.headers
+            ]
+            message_states = collections.Counter(
+                message.payload.get("status") for message in messages
+            )
+        finally:
+            for message in messages:
+                message.requeue()
+
+        oldest_age = now - min(timestamps) if timestamps else None
+        span = max(timestamps) - min(timestamps) if timestamps else 0
+
+        return self._create_report(
+            task_id,
+            exists=True,
+            depth=depth,
+            consumers=consumers,
+            sampled=len(messages),
+            total_size=sum(sizes),
+            max_message_size=max(sizes, default=0),
+            oldest_age=oldest_age,
+            newest_age=now - max(timestamps) if timestamps else None,
+            update_rate=(len(timestamps) - 1) / span if span else 0.0,
+            states=dict(message_states),
+            task_name=next((name for name in task_names if name), None),
+            orphaned=bool(
+                depth
+                and not consumers
+                and oldest_age is not None
+                and self.orphan_age is not None
+                and oldest_age > self.orphan_age,
+            ),
+            oversized=max(sizes, default=0) > self.max_message_size,
+            backlog_exceeded=depth >= self.backlog_limit,
+        )
+
+    def _create_report(self, task_id, exists, **kwargs):
+        """
+        Creates a queue report for the given task.
+
+        :param task_id: Task identifier as string
+        :param exists: Whether the result queue exists
+        :param kwargs: Values of the report
+        :return: Queue report as dict
+        """
+        report = {
+            "task_id": task_id,
+            "queue": self.backend._create_routing_key(task_id),
+            "exists": exists,
+            "depth": 0,
+            "consumers": 0,
+            "sampled": 0,
+            "total_size": 0,
+            "max_message_size": 0,
+            "oldest_age": None,
+            "newest_age": None,
+            "update_rate": 0.0,
+            "states": {},
+            "task_name": None,
+            "orphaned": False,
+            "oversized": False,
+            "backlog_exceeded": False,
+        }
+        report.update(kwargs)
+        return report
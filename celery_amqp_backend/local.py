@@ -0,0 +1,155 @@
+import collections
+import threading
+
+from celery.utils.functional import LRUCache
+
+__all__ = [
+    "LocalResultRegistry",
+]
+
+
+class LocalResultRegistry:
+    """
+    In-memory registry of ready task results, shared by all result backends of a process. Task results stored by a
+    task running in the same process as the caller (e.g. eager tasks or tasks executed by a thread pool) are handed
+    over to local waiters through this registry, without a round-trip through the broker.
+
+    Waiters register for the task identifiers they wait for and get woken up as soon as one of their task results is
+    handed over. Task results nobody waits for are only kept if they are put with `keep`, which is meant for task
+    results that are not published anywhere else. Task results are removed once they have been delivered and nobody
+    else waits for them.
+    """
+
+    def __init__(self, limit=10000):
+        self._condition = threading.Condition()
+        self._waiters = collections.Counter()
+        self._results = LRUCache(limit=limit)
+
+    def register(self, task_ids):
+        """
+        Registers a waiter for the given task identifiers.
+
+        :param task_ids: List of task identifiers
+        :return:
+        """
+        with self._condition:
+            self._waiters.update(task_ids)
+
+    def unregister(self, task_ids, delivered=()):
+        """
+        Unregisters a waiter for the given task identifiers. If nobody else waits for a task, its task result gets
+        removed if it has been delivered to the waiter, or if it has not been put with `keep`.
+
+        :param task_ids: List of task identifiers the waiter registered for
+        :param delivered: Task identifiers whose task result has been delivered to the waiter
+        :return:
+        """
+        delivered = set(delivered)
+
+        with self._condition:
+            for task_id in task_ids:
+                self._waiters[task_id] -= 1
+                if self._waiters[task_id] > 0:
+                    continue
+
+                del self._waiters[task_id]
+                entry = self._results.get(task_id)
+                if entry is not None and (task_id in delivered or not entry[1]):
+                    del self._results[task_id]
+
+    def is_waiting(self, task_id):
+        """
+        Checks whether a waiter has registered for the given task identifier.
+
+        :param task_id: Task identifier as string
+        :return: `True` if a waiter has registered for the task, `False` otherwise
+        """
+        return task_id in self._waiters
+
+    def put(self, task_id, task_result, keep=False):
+        """
+        Hands over the task result for the given task identifier to its waiters, and wakes them up. Without `keep`,
+        the task result is dropped if nobody waits for it.
+
+        :param task_id: Task identifier as string
+        :param task_result: Decoded task result as dict
+        :param keep: Keep the task result until it has been delivered, even if nobody waits for it yet
+        :return: `True` if the task result has been stored, `False` otherwise
+        """
+        with self._condition:
+            if not keep and task_id not in self._waiters:
+                return False
+
+            self._results[task_id] = (task_result, keep)
+            self._condition.notify_all()
+            return True
+
+    def get(self, task_id):
+        """
+        Gets the task result for the given task identifier without delivering it.
+
+        :param task_id: Task identifier as string
+        :return: Decoded task result as dict, or `None` if there is no task result for the task
+        """
+        with self._condition:
+            entry = self._results.get(task_id)
+        return entry[0] if entry is not None else None
+
+    def get_many(self, task_ids):
+        """
+        Gets the task results present for the given task identifiers.
+
+        :param task_ids: List of task identifiers
+        :return: Dict of task identifiers and decoded task results as dicts
+        """
+        with self._condition:
+            return self._get_many(task_ids)
+
+    def wait(self, task_ids, timeout=None):
+        """
+        Waits until a task result for at least one of the given task identifiers is present. The caller must have
+        registered for the task identifiers, as task results nobody waits for may get dropped.
+
+        :param task_ids: List of task identifiers
+        :param timeout: Maximum time to wait in seconds, or `None` to wait without limit
+        :return: Dict of task identifiers and decoded task results as dicts, empty if the timeout expired
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: any(task_id in self._results for task_id in task_ids),
+                timeout,
+            )
+            return self._get_many(task_ids)
+
+    def discard(self, task_id):
+        """
+        Removes the task result for the given task identifier, if present.
+
+        :param task_id: Task identifier as string
+        :return:
+        """
+        with self._condition:
+            self._results.pop(task_id, None)
+
+    def clear(self):
+        """
+        Removes all task results from the registry.
+
+        :return:
+        """
+        with self._condition:
+            self._results.clear()
+
+    def _get_many(self, task_ids):
+        """
+        Gets the task results present for the given task identifiers. The caller must hold the lock.
+
+        :param task_ids: List of task identifiers
+        :return: Dict of task identifiers and decoded task results as dicts
+        """
+        results = {}
+        for task_id in task_ids:
+            entry = self._results.get(task_id)
+            if entry is not None:
+                results[task_id] = entry[0]
+        return results
@@ -0,0 +1,70 @@
+import contextlib
+import threading
+import time
+
+__all__ = [
+    "PoolStatistics",
+]
+
+
+class PoolStatistics:
+    """
+    Collects how often resources got acquired from a pool and how long the acquiring took. A growing wait time is a
+    sign for a pool that is too small for the load on the result backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Resets all counters.
+
+        :return:
+        """
+        with self._lock:
+            self.acquired = 0
+            self.wait_time = 0.0
+            self.max_wait_time = 0.0
+
+    def record(self, wait_time):
+        """
+        Records a resource acquired from the pool.
+
+        :param wait_time: Time in seconds spent waiting for the resource as float
+        :return:
+        """
+        with self._lock:
+            self.acquired += 1
+            self.wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    @contextlib.contextmanager
+    def measure(self, acquire):
+        """
+        Acquires a resource using the given context manager factory and records the time spent waiting for it.
+
+        :param acquire: Callable returning a context manager that acquires the resource
+        :return: Context manager yielding the acquired resource
+        """
+        started = time.monotonic()
+        with acquire() as resource:
+            self.record(time.monotonic() - started)
+            yield resource
+
+    def as_dict(self):
+        """
+        Gets the current counters.
+
+        :return: Counters as dict
+        """
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+                "average_wait_time": (
+                    self.wait_time / self.acquired if self.acquired else 0.0
+                ),
+            }
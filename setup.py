@@ -23,6 +23,11 @@ setup(
     install_requires=[
         "celery>=5.2,<6.0",
     ],
+    entry_points={
+        "celery.commands": [
+            "amqp_results = celery_amqp_backend.command:amqp_results",
+        ],
+    },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Developers",
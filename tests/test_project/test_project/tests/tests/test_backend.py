@@ -1,5 +1,14 @@
+import os
+import tempfile
+import threading
 import time
 import celery
+import kombu
+
+from types import SimpleNamespace
+from unittest import mock
+
+from celery import result, states, uuid
 
 from celery_amqp_backend import *
 
@@ -97,6 +106,195 @@ class BackendTestCase(BaseIntegrationTestCase):
         self.assertEqual(async_result.ready(), True)
         self.assertEqual(async_result.successful(), True)
 
+    def test_get_many_prefetch(self):
+        backend = AMQPBackend(celery_app, prefetch_count=1)
+        async_job = celery.group([add_numbers.s(i, i) for i in range(10)])
+        async_result = async_job.apply_async()
+
+        result = {
+            task_id: task_result["result"]
+            for task_id, task_result in backend.get_many(
+                [r.id for r in async_result.results],
+                no_ack=False,
+                timeout=30,
+            )
+        }
+
+        self.assertEqual(
+            [result[r.id] for r in async_result.results],
+            [i + i for i in range(10)],
+        )
+
+    def test_store_result_deduplication(self):
+        backend = AMQPBackend(celery_app)
+        request = SimpleNamespace(retries=0, children=[], correlation_id=None)
+        task_id = uuid()
+
+        # A redelivered task publishes its ready result again, which must get the same message identifier. Other
+        # states may legitimately be sent multiple times, so they get distinct message identifiers.
+        for state in (states.STARTED, states.STARTED, states.SUCCESS, states.SUCCESS):
+            backend.store_result(task_id, 3, state, request=request)
+
+        with backend._acquire_channel() as (_, channel):
+            binding = backend._create_binding(task_id)(channel)
+            message_ids = []
+            while True:
+                message = binding.get(accept=backend.accept, no_ack=True)
+                if not message:
+                    break
+                message_ids.append(message.properties["message_id"])
+
+        self.assertEqual(len(message_ids), 4)
+        self.assertNotEqual(message_ids[0], message_ids[1])
+        self.assertEqual(message_ids[2], message_ids[3])
+
+        # A duplicate of a ready result that follows a newer state update is more recent than that update, so it must
+        # not be dropped as a duplicate.
+        task_id = uuid()
+        for state in (states.SUCCESS, states.STARTED, states.SUCCESS):
+            backend.store_result(task_id, 3, state, request=request)
+
+        task_meta = backend.get_task_meta(task_id)
+        self.assertEqual(task_meta["status"], states.SUCCESS)
+        self.assertEqual(task_meta["result"], 3)
+
+    def test_async_result_forget(self):
+        async_result = add_numbers.delay(1, 2)
+
+        time.sleep(5)
+
+        async_result.forget()
+
+        self.assertEqual(async_result.status, states.PENDING)
+
+    def test_forget_many(self):
+        backend = AMQPBackend(celery_app)
+        task_ids = [uuid() for _ in range(5)]
+
+        for task_id in task_ids:
+            backend.store_result(task_id, 3, states.SUCCESS)
+
+        backend.forget_many(task_ids, batch_size=2)
+
+        for task_id in task_ids:
+            self.assertEqual(backend.get_task_meta(task_id)["status"], states.PENDING)
+
+    def test_get_many_reconnect(self):
+        backend = AMQPBackend(celery_app)
+        async_result = add_numbers_slow.delay(1, 2)
+
+        drain_events = kombu.Connection.drain_events
+        failures = [ConnectionResetError()]
+
+        def flaky_drain_events(conn, **kwargs):
+            # Only fail for the test itself, not for the worker running in another thread.
+            if failures and threading.current_thread() is threading.main_thread():
+                raise failures.pop()
+            return drain_events(conn, **kwargs)
+
+        with mock.patch.object(kombu.Connection, "drain_events", flaky_drain_events):
+            result = list(backend.get_many([async_result.id], timeout=30))
+
+        self.assertEqual(failures, [])
+        self.assertEqual(result[0][1]["result"], 3)
+
+    def test_local_results(self):
+        backend = AMQPBackend(
+            celery_app,
+            local_results=True,
+            local_results_publish=False,
+        )
+        task_id = uuid()
+
+        backend.store_result(task_id, 3, states.SUCCESS)
+
+        self.assertEqual(backend.get_task_meta(task_id)["result"], 3)
+        self.assertEqual(backend.wait_for(task_id, timeout=5)["result"], 3)
+
+        backend.forget(task_id)
+
+        self.assertEqual(backend.get_task_meta(task_id)["status"], states.PENDING)
+
+    def test_dedicated_pools(self):
+        backend = AMQPBackend(celery_app, pool_limit=2)
+        task_ids = [uuid() for _ in range(5)]
+
+        for task_id in task_ids:
+            backend.store_result(task_id, 3, states.SUCCESS)
+
+        result = list(backend.get_many(task_ids, timeout=5))
+
+        self.assertEqual(len(result), 5)
+        self.assertTrue(backend.dedicated_pools)
+        self.assertIsNot(backend.connection_pool, celery_app.pool)
+        self.assertEqual(backend.connection_pool.limit, 2)
+        self.assertEqual(backend.producer_pool_statistics.as_dict()["acquired"], 5)
+        self.assertEqual(backend.connection_pool_statistics.as_dict()["acquired"], 1)
+
+    def test_reduce_many(self):
+        async_job = celery.group([add_numbers.s(i, i) for i in range(10)])
+        async_result = async_job.apply_async()
+        task_ids = [r.id for r in async_result.results]
+
+        self.assertEqual(
+            celery_app.backend.reduce_many(
+                task_ids,
+                lambda accumulated, value: accumulated + value,
+                0,
+                timeout=30,
+            ),
+            90,
+        )
+
+    def test_iter_many_chunks(self):
+        backend = AMQPBackend(celery_app)
+        task_ids = [uuid() for _ in range(5)]
+
+        for task_id in task_ids:
+            backend.store_result(task_id, 3, states.SUCCESS)
+
+        chunks = list(backend.iter_many(task_ids, chunk_size=2, timeout=5))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+    def test_persistent_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.sqlite3")
+            task_ids = [uuid() for _ in range(3)]
+
+            backend = AMQPBackend(celery_app, persistent_cache_path=path)
+            for task_id in task_ids:
+                backend.store_result(task_id, 3, states.SUCCESS)
+            list(backend.get_many(task_ids, timeout=5))
+
+            # The result messages got consumed, so a new backend has to use the persistent cache.
+            backend = AMQPBackend(celery_app, persistent_cache_path=path)
+            result = list(backend.get_many(task_ids, timeout=5))
+
+            self.assertEqual(len(result), 3)
+            self.assertEqual(backend.get_task_meta(task_ids[0])["result"], 3)
+
+    def test_compact_children(self):
+        backend = AMQPBackend(celery_app, children_encoding="compact")
+        task_id = uuid()
+        children = [
+            result.AsyncResult(uuid(), app=celery_app),
+            result.GroupResult(
+                uuid(),
+                [result.AsyncResult(uuid(), app=celery_app) for _ in range(3)],
+                app=celery_app,
+            ),
+        ]
+        request = SimpleNamespace(children=children, correlation_id=None, retries=0)
+
+        backend.store_result(task_id, 3, states.SUCCESS, request=request)
+
+        self.assertIsInstance(backend._encode_children(request), dict)
+        self.assertEqual(
+            list(backend.get_task_meta(task_id)["children"]),
+            [child.as_tuple() for child in children],
+        )
+
     def test_async_result_timeout(self):
         with self.assertRaises(AMQPWaitTimeoutException):
             async_result = add_numbers_slow.delay(1, 2)
@@ -0,0 +1,326 @@
+import kombu
+import os
+import tempfile
+import threading
+import time
+
+from unittest import mock
+
+from django import test
+
+from celery import Celery, states, uuid
+
+from celery_amqp_backend import *
+
+__all__ = [
+    "MemoryBackendTestCase",
+]
+
+
+memory_app = Celery(
+    "test_backend_memory",
+    broker="memory://",
+    backend="celery_amqp_backend.AMQPBackend://",
+)
+memory_app.conf.broker_transport_options = {
+    "polling_interval": 0.01,
+}
+
+
+class RecordingConsumer(kombu.Consumer):
+    """
+    Consumer that keeps track of its instances, so that tests can inspect the channels used by the backend.
+    """
+
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instances.append(self)
+
+
+class MemoryBackendTestCase(test.SimpleTestCase):
+    """
+    Tests for the result backend using kombu's in-memory transport, which do not need a running broker.
+    """
+
+    def _create_backend(self, **kwargs):
+        RecordingConsumer.instances.clear()
+        backend = AMQPBackend(memory_app, **kwargs)
+        backend.Consumer = RecordingConsumer
+        return backend
+
+    def _store_results(self, backend, count):
+        task_ids = [uuid() for _ in range(count)]
+        for task_id in task_ids:
+            backend.store_result(task_id, 3, states.SUCCESS)
+        return task_ids
+
+    def _message_count(self, backend, task_id):
+        with memory_app.connection_for_write() as conn:
+            return conn.default_channel.queue_declare(
+                backend._create_routing_key(task_id),
+                passive=True,
+            ).message_count
+
+    def _unacknowledged(self, consumer):
+        qos = consumer.channel.qos
+        return [tag for tag in qos._delivered if tag not in qos._dirty]
+
+    def test_get_many_prefetch(self):
+        backend = self._create_backend(prefetch_count=1)
+        task_ids = self._store_results(backend, 5)
+
+        results = backend.get_many(task_ids, no_ack=False, timeout=5)
+        task_id, _ = next(results)
+        (consumer,) = RecordingConsumer.instances
+
+        # The yielded message stays unacknowledged until the caller resumes the iterator, and the prefetch count keeps
+        # the broker from delivering any further message meanwhile.
+        self.assertEqual(consumer.channel.qos.prefetch_count, 1)
+        self.assertEqual(len(self._unacknowledged(consumer)), 1)
+        self.assertEqual(
+            sum(self._message_count(backend, t) for t in task_ids if t != task_id),
+            4,
+        )
+
+        results.close()
+
+        # The yielded message got acknowledged, the others are still on their queues.
+        self.assertEqual(self._unacknowledged(consumer), [])
+        self.assertEqual(self._message_count(backend, task_id), 0)
+        self.assertEqual(
+            sorted(self._message_count(backend, t) for t in task_ids),
+            [0, 1, 1, 1, 1],
+        )
+
+    def test_get_many_prefetch_close(self):
+        backend = self._create_backend(prefetch_count=2)
+        task_ids = self._store_results(backend, 4)
+
+        results = backend.get_many(task_ids, no_ack=False, timeout=5)
+        yielded = [next(results)[0] for _ in range(2)]
+        results.close()
+        (consumer,) = RecordingConsumer.instances
+
+        self.assertEqual(self._unacknowledged(consumer), [])
+        for task_id in task_ids:
+            self.assertEqual(
+                self._message_count(backend, task_id),
+                0 if task_id in yielded else 1,
+            )
+
+    def test_get_many_prefetch_pool(self):
+        # Both backends share the only connection of the pool, and thus its default channel.
+        app = Celery(
+            "test_backend_memory_pool",
+            broker="memory://",
+            backend="celery_amqp_backend.AMQPBackend://",
+        )
+        app.conf.broker_pool_limit = 1
+        app.conf.broker_transport_options = memory_app.conf.broker_transport_options
+
+        prefetch_backend = AMQPBackend(app, prefetch_count=1)
+        backend = AMQPBackend(app)
+
+        # The prefetch limit must not stay on the shared channel.
+        task_ids = self._store_results(prefetch_backend, 3)
+        self.assertEqual(
+            len(list(prefetch_backend.get_many(task_ids, no_ack=False, timeout=1))),
+            3,
+        )
+        task_ids = self._store_results(backend, 3)
+        self.assertEqual(
+            len(list(backend.get_many(task_ids, no_ack=False, timeout=1))),
+            3,
+        )
+
+        # The messages left unacknowledged on the shared channel must not fill the prefetch window.
+        task_ids = self._store_results(prefetch_backend, 3)
+        self.assertEqual(
+            len(list(prefetch_backend.get_many(task_ids, no_ack=False, timeout=1))),
+            3,
+        )
+
+    def test_dedicated_pools_threads(self):
+        backend = self._create_backend(pool_limit=2)
+        barrier = threading.Barrier(8)
+        pools = []
+
+        def create_pools():
+            barrier.wait()
+            pools.append((backend.connection_pool, backend.producer_pool))
+
+        with mock.patch.object(
+            kombu.Connection,
+            "Pool",
+            side_effect=lambda *args, **kwargs: (time.sleep(0.01), mock.Mock())[1],
+        ) as create_pool:
+            threads = [threading.Thread(target=create_pools) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        # All threads get the same pools, which got created only once.
+        self.assertEqual(create_pool.call_count, 1)
+        self.assertEqual(len(set(pools)), 1)
+
+    def test_wait_for_prefetch(self):
+        backend = self._create_backend(prefetch_count=2)
+        (task_id,) = self._store_results(backend, 1)
+
+        self.assertEqual(
+            backend.wait_for(task_id, no_ack=False, timeout=5)["result"],
+            3,
+        )
+        (consumer,) = RecordingConsumer.instances
+
+        self.assertEqual(self._unacknowledged(consumer), [])
+
+    def test_get_many_reconnect_keeps_received_results(self):
+        backend = self._create_backend(prefetch_count=10)
+        task_ids = self._store_results(backend, 3)
+
+        drain_events = kombu.Connection.drain_events
+        failures = [True]
+
+        def flaky_drain_events(conn, **kwargs):
+            # Lose the connection right after a message has been received.
+            result = drain_events(conn, **kwargs)
+            if failures:
+                failures.pop()
+                raise conn.recoverable_connection_errors[0]()
+            return result
+
+        with mock.patch.object(kombu.Connection, "drain_events", flaky_drain_events):
+            result = list(backend.get_many(task_ids, no_ack=False, timeout=5))
+
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(task_id for task_id, _ in result), sorted(task_ids))
+        self.assertEqual(self._unacknowledged(RecordingConsumer.instances[0]), [])
+
+    def test_reduce_many_cached_results(self):
+        backend = self._create_backend(max_cached_results=10)
+        task_ids = self._store_results(backend, 2)
+
+        self.assertEqual(len(list(backend.get_many(task_ids, timeout=1))), 2)
+
+        # The result messages got consumed, so the results must come from the cache.
+        self.assertEqual(
+            backend.reduce_many(task_ids, lambda a, v: a + v, 0, timeout=1),
+            6,
+        )
+
+    def test_get_many_persistent_cache(self):
+        path = os.path.join(tempfile.mkdtemp(), "results.sqlite3")
+        backend = self._create_backend(persistent_cache_path=path)
+        task_ids = self._store_results(backend, 3)
+
+        with mock.patch.object(
+            backend.persistent_cache,
+            "put_many",
+            wraps=backend.persistent_cache.put_many,
+        ) as put_many:
+            self.assertEqual(len(list(backend.get_many(task_ids[:2], timeout=5))), 2)
+
+        # Only the requested task results got persisted, in one transaction per drain.
+        self.assertLessEqual(put_many.call_count, 2)
+        self.assertEqual(
+            sorted(backend.persistent_cache.get_many(task_ids)),
+            sorted(task_ids[:2]),
+        )
+
+        # A new backend finds the results in the persistent cache without touching the queues.
+        backend = self._create_backend(persistent_cache_path=path)
+        self.assertEqual(
+            dict(backend.get_many(task_ids[:2], timeout=1)),
+            {task_id: mock.ANY for task_id in task_ids[:2]},
+        )
+        self.assertEqual(RecordingConsumer.instances, [])
+
+    def test_forget_many_persistent_cache(self):
+        path = os.path.join(tempfile.mkdtemp(), "results.sqlite3")
+        backend = self._create_backend(persistent_cache_path=path)
+        task_ids = self._store_results(backend, 5)
+        list(backend.get_many(task_ids, timeout=5))
+
+        with mock.patch.object(
+            backend.persistent_cache,
+            "discard_many",
+            wraps=backend.persistent_cache.discard_many,
+        ) as discard_many:
+            backend.forget_many(task_ids, batch_size=2)
+
+        # The persistent cache entries are removed with one transaction per batch.
+        self.assertEqual(discard_many.call_count, 3)
+        self.assertEqual(backend.persistent_cache.get_many(task_ids), {})
+
+    def test_persistent_cache_eviction(self):
+        cache = PersistentResultCache(
+            os.path.join(tempfile.mkdtemp(), "results.sqlite3"),
+            max_entries=100,
+        )
+
+        def put(keys):
+            cache.put_many([(key, b"1", "application/json", "utf-8") for key in keys])
+
+        def count():
+            return (
+                cache._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            )
+
+        # Evictions only run once the writes since the last eviction exceed 10% of the maximum number of entries.
+        put(str(i) for i in range(100))
+        put(f"a{i}" for i in range(10))
+        self.assertEqual(count(), 110)
+
+        # Reads do not write, but the entries read are kept when evicting.
+        self.assertIsNotNone(cache.get("0"))
+        put(["b"])
+        self.assertEqual(count(), 100)
+        self.assertIsNotNone(cache.get("0"))
+        self.assertIsNotNone(cache.get("b"))
+
+    def test_local_results_waiter(self):
+        backend = self._create_backend(
+            local_results=True,
+            local_results_publish=False,
+        )
+        task_id = uuid()
+        results = []
+
+        waiter = threading.Thread(
+            target=lambda: results.append(
+                (backend.wait_for(task_id, timeout=5), time.monotonic()),
+            ),
+        )
+        waiter.start()
+        time.sleep(0.1)
+
+        stored_at = time.monotonic()
+        backend.store_result(task_id, (1, 2), states.SUCCESS)
+        waiter.join(5)
+
+        ((task_result, received_at),) = results
+
+        # The waiter gets woken up right away, and gets the task result as a remote waiter would.
+        self.assertLess(received_at - stored_at, 0.05)
+        self.assertEqual(task_result["result"], [1, 2])
+
+        # Neither the waiter nor the task touched the broker, and the delivered task result is gone.
+        self.assertEqual(RecordingConsumer.instances, [])
+        with self.assertRaises(memory_app.connection_for_write().channel_errors):
+            self._message_count(backend, task_id)
+        self.assertIsNone(backend.local_result_registry.get(task_id))
+
+    def test_local_results_without_waiter(self):
+        backend = self._create_backend(local_results=True)
+        task_id = uuid()
+
+        # Nobody waits for the task result, so it is only published to the broker.
+        backend.store_result(task_id, 3, states.SUCCESS)
+
+        self.assertIsNone(backend.local_result_registry.get(task_id))
+        self.assertEqual(self._message_count(backend, task_id), 1)
+        self.assertEqual(backend.wait_for(task_id, timeout=5)["result"], 3)
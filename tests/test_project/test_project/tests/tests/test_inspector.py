@@ -0,0 +1,112 @@
+import kombu
+
+from types import SimpleNamespace
+from unittest import mock
+
+from click.testing import CliRunner
+from django import test
+
+from celery import Celery, states, uuid
+from celery.bin.base import CLIContext
+
+from celery_amqp_backend import *
+from celery_amqp_backend.command import amqp_results
+
+__all__ = [
+    "ResultQueueInspectorTestCase",
+]
+
+
+memory_app = Celery(
+    "test_inspector",
+    broker="memory://",
+    backend="celery_amqp_backend.AMQPBackend://",
+)
+
+
+class ResultQueueInspectorTestCase(test.SimpleTestCase):
+    def setUp(self):
+        self.backend = memory_app.backend
+        self.request = SimpleNamespace(
+            task="tests.add_numbers",
+            children=[],
+            correlation_id=None,
+            retries=0,
+        )
+
+    def test_inspect(self):
+        task_id, big_task_id, missing_task_id = uuid(), uuid(), uuid()
+
+        for i in range(5):
+            self.backend.store_result(task_id, i, "PROGRESS", request=self.request)
+        self.backend.store_result(task_id, 3, states.SUCCESS, request=self.request)
+        self.backend.store_result(
+            big_task_id,
+            "x" * 5000,
+            states.SUCCESS,
+            request=self.request,
+        )
+
+        report = ResultQueueInspector(
+            self.backend,
+            max_message_size=1000,
+            backlog_limit=5,
+        ).inspect([task_id, big_task_id, missing_task_id])
+        queues = {queue["task_id"]: queue for queue in report["queues"]}
+
+        self.assertEqual(queues[task_id]["depth"], 6)
+        self.assertEqual(queues[task_id]["states"], {"PROGRESS": 5, "SUCCESS": 1})
+        self.assertTrue(queues[task_id]["backlog_exceeded"])
+        self.assertTrue(queues[big_task_id]["oversized"])
+        self.assertFalse(queues[missing_task_id]["exists"])
+        self.assertEqual(report["tasks"]["tests.add_numbers"]["queues"], 2)
+        self.assertEqual(
+            report["tasks"]["tests.add_numbers"]["oversized"],
+            [big_task_id],
+        )
+
+        # The sampled messages must still be on the queue.
+        self.assertEqual(self.backend.get_task_meta(task_id)["result"], 3)
+
+    def test_inspect_depth_only(self):
+        task_id = uuid()
+        for i in range(3):
+            self.backend.store_result(task_id, i, "PROGRESS", request=self.request)
+
+        with mock.patch.object(kombu.Queue, "get") as get:
+            (queue,) = ResultQueueInspector(
+                self.backend,
+                backlog_limit=3,
+                depth_only=True,
+            ).inspect_queues([task_id])
+
+        get.assert_not_called()
+        self.assertEqual(queue["depth"], 3)
+        self.assertEqual(queue["sampled"], 0)
+        self.assertTrue(queue["backlog_exceeded"])
+
+    def test_inspection_headers(self):
+        backend = AMQPBackend(memory_app, inspection_headers=False)
+        task_id = uuid()
+        backend.store_result(task_id, 3, states.SUCCESS, request=self.request)
+
+        (queue,) = ResultQueueInspector(backend).inspect_queues([task_id])
+
+        self.assertEqual(queue["sampled"], 1)
+        self.assertIsNone(queue["task_name"])
+        self.assertIsNone(queue["oldest_age"])
+
+    def test_command(self):
+        task_id = uuid()
+        self.backend.store_result(task_id, 3, states.SUCCESS, request=self.request)
+
+        # The command group is invoked on its own with an app context, as the `celery` program would do, so that
+        # Celery's global command group stays untouched.
+        result = CliRunner().invoke(
+            amqp_results,
+            ["inspect", task_id],
+            obj=CLIContext(app=memory_app, no_color=True, workdir=None),
+        )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("task=tests.add_numbers depth=1", result.output)